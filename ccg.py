@@ -1,10 +1,28 @@
 from read_data import *
+import io
 
 __version__ = 3.0
 
 #-------------------------------------------------------------
-# Define the order that the configuration will be generated
+# Return the generated text of each section for a device,
+# used by the regression harness to compare output
 #-------------------------------------------------------------
+def get_device_sections(device):
+    console = sys.stdout
+    sections = []
+    try:
+        for section, function, args in CONFIG_SECTIONS:
+            sys.stdout = io.StringIO()
+            function(device, *args)
+            sections.append((section, sys.stdout.getvalue()))
+    finally:
+        sys.stdout = console
+    return sections
+
+def show_device_config(device):
+    for section, function, args in CONFIG_SECTIONS:
+        function(device, *args)
+
 def show_all_config():
     console = sys.__stdout__
 
@@ -14,30 +32,21 @@ def show_all_config():
         logfile = Logger('ccg-{}.txt'.format(device))
         sys.stdout = logfile
 
-        # order listed below
-        show_global_config(device,'start')
-        show_vrf_config(device)
-        show_vlans_config(device)
-        show_interface_config(device,'physical')
-        show_interface_config(device,'logical')
-        show_routing_config(device)
-        show_global_config(device,'end')
+        show_device_config(device)
         sys.stdout = console
 
 #--------------------------------------------------
 # Generate the global configuration for the device
 #--------------------------------------------------
 def show_global_config(device_name=None, config_position=None):
-    template_list = get_template_list(device_name, config_position)
+    device = get_device(device_name)
+    template_list = device.template_positions[config_position]
     if template_list:
         print ("\n!----------------------------------------------------")
         print ("! Global configuration for ({}) @ {}  ".format(device_name,config_position))
         print ("!------------------------------------------------------")
     for template in template_list:
-        config_template = d.templates[template]
-        print ("\n! [{} template used]:".format(template))
-        for config in config_template:
-            print (config)
+        print (d.rendered_templates[template])
 #------------------------------------------------
 # Generate the VRF configuration for the device
 #------------------------------------------------
@@ -172,6 +181,20 @@ def show_interface_config(device_name=None, mode=None):
         if 'no' in intf.enabled:
             print ('  shutdown')
 
+#-------------------------------------------------------------
+# Define the order that the configuration will be generated
+# (section name, function, extra arguments after device name)
+#-------------------------------------------------------------
+CONFIG_SECTIONS = [
+    ('global_start',       show_global_config,    ('start',)),
+    ('vrf',                show_vrf_config,       ()),
+    ('vlans',              show_vlans_config,     ()),
+    ('interface_physical', show_interface_config, ('physical',)),
+    ('interface_logical',  show_interface_config, ('logical',)),
+    ('routing',            show_routing_config,   ()),
+    ('global_end',         show_global_config,    ('end',)),
+]
+
 def main(argv):
     arg_length = len(sys.argv)
 
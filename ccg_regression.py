@@ -0,0 +1,285 @@
+import argparse
+import contextlib
+import difflib
+import hashlib
+import io
+import json
+import multiprocessing
+import os
+import sys
+
+import ccg
+import read_data
+
+__version__ = 1.0
+
+#---------------------------------------------------------------
+# Golden-file regression harness
+#
+# record: render every device of the reference workbooks and
+#         store a hash per device and section in a golden file
+# check:  render the same workbooks again, compare the hashes
+#         and report only the devices whose output has changed
+#---------------------------------------------------------------
+
+# workbook currently loaded by this worker process
+LOADED_WORKBOOK = None
+
+def load_workbook(filename):
+    global LOADED_WORKBOOK
+    if LOADED_WORKBOOK != filename:
+        LOADED_WORKBOOK = None
+        read_data.initalise_data(filename)
+        LOADED_WORKBOOK = filename
+
+def hash_text(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+#---------------------------------------------------------------
+# Devices are split into slices by a hash of their name, so the
+# golden file and the workbook always agree on which slice a
+# device belongs to, even when devices are added or removed
+#---------------------------------------------------------------
+def device_slice(device, count):
+    return int(hash_text(device)[:8], 16) % count
+
+def slice_devices(devices, index, count):
+    return [device for device in sorted(devices) if device_slice(device, count) == index]
+
+#---------------------------------------------------------------
+# Run a task in a worker and turn any failure into an error
+# result, read_data calls exit() on bad input and a worker that
+# dies would leave the pool waiting for its result forever
+#---------------------------------------------------------------
+def run_task(function, task):
+    name = task[0]
+    output = io.StringIO()
+    try:
+        with contextlib.redirect_stdout(output):
+            return name, function(*task[1:]), None
+    except SystemExit:
+        messages = [line for line in output.getvalue().splitlines()
+                    if line and line != 'Script failed.']
+        return name, None, '; '.join(messages) or 'workbook could not be loaded'
+    except Exception as e:
+        return name, None, '{}: {}'.format(type(e).__name__, e)
+
+#---------------------------------------------------------------
+# Render one slice of the devices in a workbook
+#---------------------------------------------------------------
+def render_devices(workbook, index, count, with_text):
+    load_workbook(workbook)
+    results = {}
+    for device in slice_devices(read_data.d.devices, index, count):
+        sections = {}
+        for section, text in ccg.get_device_sections(device):
+            sections[section] = {'hash': hash_text(text)}
+            if with_text:
+                sections[section]['text'] = text
+        results[device] = sections
+    return results
+
+#---------------------------------------------------------------
+# Render one slice of the devices in a workbook and return only
+# the devices that do not match the same slice of the golden file
+#---------------------------------------------------------------
+def compare_devices(workbook, index, count, expected):
+    load_workbook(workbook)
+    mismatches = {}
+    devices = slice_devices(read_data.d.devices, index, count)
+    for device in devices:
+        actual = dict(ccg.get_device_sections(device))
+        golden_sections = expected.get(device)
+        if golden_sections is None:
+            mismatches[device] = [('device', 'added', None, None)]
+            continue
+        changes = []
+        for section in sorted(set(actual) | set(golden_sections)):
+            if section not in golden_sections:
+                changes.append((section, 'added', None, actual[section]))
+            elif section not in actual:
+                changes.append((section, 'removed', golden_sections[section].get('text'), None))
+            elif hash_text(actual[section]) != golden_sections[section]['hash']:
+                changes.append((section, 'changed', golden_sections[section].get('text'), actual[section]))
+        if changes:
+            mismatches[device] = changes
+    for device in sorted(set(expected) - set(devices)):
+        mismatches[device] = [('device', 'removed', None, None)]
+    return mismatches
+
+def record_task(task):
+    return run_task(render_devices, task)
+
+def compare_task(task):
+    return run_task(compare_devices, task)
+
+#---------------------------------------------------------------
+# Every worker is kept busy: with fewer workbooks than workers a
+# workbook is split into slices, and each slice loads the
+# workbook again, with enough workbooks each is loaded once
+#---------------------------------------------------------------
+def workbook_slices(workbooks, jobs):
+    return max(1, -(-jobs // max(1, len(workbooks))))
+
+#---------------------------------------------------------------
+# Each task is (name in golden file, path to workbook, slice no,
+# number of slices) followed by the task specific argument
+#---------------------------------------------------------------
+def make_record_tasks(workbooks, jobs, with_text):
+    count = workbook_slices(workbooks, jobs)
+    return [(name, path, index, count, with_text)
+            for name, path in workbooks for index in range(count)]
+
+def make_check_tasks(workbooks, jobs, golden):
+    count = workbook_slices(workbooks, jobs)
+    tasks = []
+    for name, path in workbooks:
+        expected = [{} for index in range(count)]
+        for device in golden[name]:
+            expected[device_slice(device, count)][device] = golden[name][device]
+        tasks.extend((name, path, index, count, expected[index]) for index in range(count))
+    return tasks
+
+def check_workbooks_exist(workbooks):
+    missing = [name for name, path in workbooks if not os.path.isfile(path)]
+    for name in missing:
+        print ('Cannot read data from: \'{}\''.format(name))
+    if missing:
+        print ('Script failed.')
+        exit(2)
+
+def show_errors(errors):
+    for name in sorted(errors):
+        print ('Cannot render: \'{}\' ({})'.format(name, errors[name]))
+    print ('Script failed.')
+    return 2
+
+#---------------------------------------------------------------
+# Workbooks are stored relative to the golden file's directory
+# so that check can be run from any working directory
+#---------------------------------------------------------------
+def workbook_name(golden_file, path):
+    golden_dir = os.path.dirname(os.path.abspath(golden_file))
+    try:
+        return os.path.relpath(os.path.abspath(path), golden_dir).replace(os.sep, '/')
+    except ValueError:
+        # different drive on Windows, keep the absolute path
+        return os.path.abspath(path)
+
+def workbook_path(golden_file, name):
+    golden_dir = os.path.dirname(os.path.abspath(golden_file))
+    return os.path.normpath(os.path.join(golden_dir, name))
+
+def check_golden_writable(golden_file):
+    golden_dir = os.path.dirname(os.path.abspath(golden_file))
+    if not os.path.isdir(golden_dir) or not os.access(golden_dir, os.W_OK):
+        print ('Cannot write golden file: \'{}\''.format(golden_file))
+        print ('Script failed.')
+        exit(2)
+
+def record(golden_file, workbooks, jobs, with_text):
+    workbooks = [(workbook_name(golden_file, path), path) for path in workbooks]
+    check_workbooks_exist(workbooks)
+    check_golden_writable(golden_file)
+    golden = {'version': __version__, 'workbooks': {}}
+    for name, path in workbooks:
+        golden['workbooks'][name] = {}
+    errors = {}
+    with multiprocessing.Pool(jobs) as pool:
+        for name, results, error in pool.imap_unordered(record_task, make_record_tasks(workbooks, jobs, with_text)):
+            if error:
+                errors[name] = error
+            else:
+                golden['workbooks'][name].update(results)
+    if errors:
+        return show_errors(errors)
+    try:
+        with open(golden_file, 'w') as f:
+            json.dump(golden, f, indent=1, sort_keys=True)
+    except (IOError, OSError) as e:
+        print ('Cannot write golden file: \'{}\' ({})'.format(golden_file, e))
+        print ('Script failed.')
+        return 2
+    devices = sum(len(golden['workbooks'][name]) for name in golden['workbooks'])
+    print ('Recorded {} devices from {} workbooks to: \'{}\''.format(devices, len(golden['workbooks']), golden_file))
+    return 0
+
+def read_golden_file(golden_file):
+    try:
+        with open(golden_file) as f:
+            golden = json.load(f)
+    except (IOError, ValueError) as e:
+        print ('Cannot read golden file: \'{}\' ({})'.format(golden_file, e))
+        print ('Script failed.')
+        exit(2)
+    if not isinstance(golden, dict) or not isinstance(golden.get('workbooks'), dict):
+        print ('Not a golden file: \'{}\''.format(golden_file))
+        print ('Script failed.')
+        exit(2)
+    if golden.get('version') != __version__:
+        print ('Golden file version {} is not supported (expected {}), record it again: \'{}\''.format(
+            golden.get('version'), __version__, golden_file))
+        print ('Script failed.')
+        exit(2)
+    return golden['workbooks']
+
+def show_section_diff(workbook, device, section, golden_text, actual_text):
+    if golden_text is None or actual_text is None:
+        return
+    diff = difflib.unified_diff(golden_text.splitlines(), actual_text.splitlines(),
+                                '{}:{}:{} (golden)'.format(workbook, device, section),
+                                '{}:{}:{} (current)'.format(workbook, device, section),
+                                lineterm='')
+    for line in diff:
+        print ('      {}'.format(line))
+
+def check(golden_file, jobs):
+    golden = read_golden_file(golden_file)
+    workbooks = [(name, workbook_path(golden_file, name)) for name in sorted(golden)]
+    check_workbooks_exist(workbooks)
+    mismatches = {}
+    errors = {}
+    with multiprocessing.Pool(jobs) as pool:
+        for name, results, error in pool.imap_unordered(compare_task, make_check_tasks(workbooks, jobs, golden)):
+            if error:
+                errors[name] = error
+            else:
+                mismatches.setdefault(name, {}).update(results)
+    if errors:
+        return show_errors(errors)
+    total = 0
+    for workbook in sorted(golden):
+        for device in sorted(mismatches.get(workbook, {})):
+            total += 1
+            print ('{}: {}'.format(workbook, device))
+            for section, change, golden_text, actual_text in mismatches[workbook][device]:
+                print ('  -- {0: <22} [{1}]'.format(section, change))
+                show_section_diff(workbook, device, section, golden_text, actual_text)
+    devices = sum(len(golden[workbook]) for workbook in golden)
+    print ('Checked {} devices from {} workbooks: {} mismatched'.format(devices, len(golden), total))
+    return 1 if total else 0
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='Cisco Config Generator regression harness')
+    parser.add_argument('-j', '--jobs', type=int, default=multiprocessing.cpu_count(),
+                        help='number of worker processes (default: number of CPUs)')
+    commands = parser.add_subparsers(dest='command')
+    record_parser = commands.add_parser('record', help='render the workbooks and write the golden file')
+    record_parser.add_argument('golden')
+    record_parser.add_argument('workbooks', nargs='+')
+    record_parser.add_argument('--with-text', action='store_true',
+                               help='also store the section text so mismatches can show a diff')
+    check_parser = commands.add_parser('check', help='render the workbooks again and compare to the golden file')
+    check_parser.add_argument('golden')
+    args = parser.parse_args(argv[1:])
+
+    jobs = max(1, args.jobs)
+    if args.command == 'record':
+        return record(args.golden, args.workbooks, jobs, args.with_text)
+    if args.command == 'check':
+        return check(args.golden, jobs)
+    parser.print_help()
+    return 2
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -4,6 +4,7 @@ import netaddr
 import sys
 
 DATA = {}
+TEMPLATE_POSITIONS = ['start', 'end']
 
 #-----------------------------------------
 # Used to redirect output to a text file
@@ -20,6 +21,7 @@ class Logger(object):
 class Database(object):
     def __init__(self):
         self.templates = {}
+        self.rendered_templates = {}
         self.variables = {}
         self.devices = {}
 
@@ -27,6 +29,7 @@ class Device(object):
     def __init__(self):
         self.name = ''
         self.templates = {}
+        self.template_positions = {}
         self.vlans = {}
         self.interfaces = {}
         self.vrfs = {}
@@ -299,6 +302,9 @@ def initalise_config_templates():
             templates[template_name] = []
         else:
             templates[template_name].append(line)
+    # Expand the [include:other] directives in each template
+    for template in templates:
+        templates[template] = expand_template_includes(templates, template)
     # Update the dynamic variable in each template
     for template in templates:
         updated_config = []
@@ -308,7 +314,34 @@ def initalise_config_templates():
                 if search_phrase in line:
                     line = line.replace(search_phrase, str(d.variables[variable]))
             updated_config.append(line)
-            d.templates[template] = updated_config
+        d.templates[template] = updated_config
+    # Render each template once so that every device can reuse the same text
+    for template in d.templates:
+        header = '\n! [{} template used]:'.format(template)
+        d.rendered_templates[template] = '\n'.join([header] + d.templates[template])
+
+#--------------------------------------------------------------
+# Replace [include:other] lines with the lines of the template
+# they refer to, nested includes are expanded recursively
+#--------------------------------------------------------------
+def expand_template_includes(templates, template_name, parents=()):
+    if template_name in parents:
+        print ('Template include loop detected: {}'.format(' -> '.join(parents + (template_name,))))
+        print ('Script failed.')
+        exit()
+    expanded_config = []
+    for line in templates[template_name]:
+        include = re.match(r'^\s*\[include:(.*?)\]\s*$', line, re.IGNORECASE)
+        if not include:
+            expanded_config.append(line)
+            continue
+        include_name = include.group(1).strip()
+        if include_name not in templates:
+            print ('Template \'{}\' includes unknown template \'{}\''.format(template_name, include_name))
+            print ('Script failed.')
+            exit()
+        expanded_config.extend(expand_template_includes(templates, include_name, parents + (template_name,)))
+    return expanded_config
 
 def initilise_device_templates():
     WORKSHEET_NAME = 'device_templates'
@@ -321,6 +354,14 @@ def initilise_device_templates():
             device = get_device(device_name)
             device.templates[template.name] = template
 
+#------------------------------------------------------------
+# Work out which templates each device uses for each position
+#------------------------------------------------------------
+def initalise_template_positions():
+    for device in d.devices:
+        for position in TEMPLATE_POSITIONS:
+            d.devices[device].template_positions[position] = get_template_list(device, position)
+
 def initalise_vlans():
     WORKSHEET_NAME = 'vlans'
     for row_no, row in enumerate(DATA[WORKSHEET_NAME]):
@@ -490,11 +531,15 @@ d = Database()
 # Read the data from the spreadsheet
 #------------------------------------
 def initalise_data(filename):
+    # start from an empty database so a workbook can be (re)loaded in the same process
+    DATA.clear()
+    d.__init__()
     read_database_from_file(filename)
     initalise_devices()
     initalise_variables()
     initalise_config_templates()
     initilise_device_templates()
+    initalise_template_positions()
     initalise_vlans()
     initalise_vrfs()
     initalise_l2_interfaces()
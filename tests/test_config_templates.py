@@ -0,0 +1,121 @@
+import pytest
+
+import read_data
+
+COLUMN = 'Enter config templates below this line:'
+
+#---------------------------------------------------------------
+# Load the rows of a 'config-templates' worksheet into an empty
+# database, the same way read_database_from_file stores them
+#---------------------------------------------------------------
+def load_templates(rows, variables=None):
+    read_data.DATA.clear()
+    read_data.d.__init__()
+    for name, value in (variables or {}).items():
+        variable = read_data.Variable()
+        variable.name = name
+        variable.value = value
+        read_data.d.variables[name] = variable
+    read_data.DATA['config-templates'] = [{COLUMN: row} for row in rows]
+    read_data.initalise_config_templates()
+
+
+def test_nested_include_is_expanded():
+    load_templates([
+        'Config Template: [base]',
+        'hostname [HOST]',
+        'Config Template: [aaa]',
+        '[include:base]',
+        'aaa new-model',
+        'Config Template: [site]',
+        '  [INCLUDE:aaa]  ',
+        'ntp server 10.0.0.1',
+    ], variables={'HOST': 'core-1'})
+    assert read_data.d.templates['aaa'] == ['hostname core-1', 'aaa new-model']
+    assert read_data.d.templates['site'] == ['hostname core-1', 'aaa new-model', 'ntp server 10.0.0.1']
+    assert read_data.d.rendered_templates['site'] == (
+        '\n! [site template used]:\nhostname core-1\naaa new-model\nntp server 10.0.0.1')
+
+
+def test_template_without_lines_is_rendered():
+    load_templates(['Config Template: [empty]', 'Config Template: [other]', 'line'])
+    assert read_data.d.templates['empty'] == []
+    assert read_data.d.rendered_templates['empty'] == '\n! [empty template used]:'
+
+
+def test_include_loop_stops_the_script(capsys):
+    with pytest.raises(SystemExit):
+        load_templates([
+            'Config Template: [a]',
+            '[include:b]',
+            'Config Template: [b]',
+            '[include:a]',
+        ])
+    assert 'Template include loop detected: a -> b -> a' in capsys.readouterr().out
+
+
+def test_unknown_include_stops_the_script(capsys):
+    with pytest.raises(SystemExit):
+        load_templates(['Config Template: [a]', '[include:missing]'])
+    assert 'Template \'a\' includes unknown template \'missing\'' in capsys.readouterr().out
+
+
+#---------------------------------------------------------------
+# Add a device that uses the given templates, rows are in the
+# same layout as the 'device_templates' worksheet
+#---------------------------------------------------------------
+def load_device_templates(device_name, positions):
+    device = read_data.Device()
+    device.name = device_name
+    read_data.d.devices[device_name] = device
+    read_data.DATA['device_templates'] = [
+        {'Device Name': device_name.upper(), 'Config Template': template, 'Position (Default: Start)': position}
+        for template, position in positions]
+    read_data.initilise_device_templates()
+    read_data.initalise_template_positions()
+    return device
+
+
+def test_template_positions_are_precomputed():
+    load_templates([])
+    device = load_device_templates('sw1', [
+        ('zz-end', 'End'),
+        ('aa-start', ' Start '),
+        ('both', 'start/end'),
+        ('blank', ''),
+    ])
+    # positions match on a substring, the same as get_template_list
+    assert device.template_positions == {
+        'start': ['aa-start', 'both'],
+        'end': ['both', 'zz-end'],
+    }
+    for position in read_data.TEMPLATE_POSITIONS:
+        assert device.template_positions[position] == read_data.get_template_list('sw1', position)
+
+
+def test_global_config_output(capsys):
+    import ccg
+    load_templates([
+        'Config Template: [banner]',
+        'banner motd ^C',
+        'Config Template: [ntp]',
+        'ntp server 10.0.0.1',
+        'Config Template: [save]',
+        'end',
+    ])
+    load_device_templates('sw1', [('banner', 'start'), ('ntp', 'start'), ('save', 'end')])
+    ccg.show_global_config('sw1', 'start')
+    ccg.show_global_config('sw1', 'end')
+    assert capsys.readouterr().out == (
+        '\n!----------------------------------------------------\n'
+        '! Global configuration for (sw1) @ start  \n'
+        '!------------------------------------------------------\n'
+        '\n! [banner template used]:\n'
+        'banner motd ^C\n'
+        '\n! [ntp template used]:\n'
+        'ntp server 10.0.0.1\n'
+        '\n!----------------------------------------------------\n'
+        '! Global configuration for (sw1) @ end  \n'
+        '!------------------------------------------------------\n'
+        '\n! [save template used]:\n'
+        'end\n')
@@ -0,0 +1,126 @@
+import io
+import json
+import os
+import shutil
+from contextlib import redirect_stdout
+
+import pytest
+
+import ccg
+import ccg_regression
+import read_data
+
+BUILD_WORKBOOK = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'build.xlsx')
+
+#---------------------------------------------------------------
+# Record a golden file (with section text) for a copy of the
+# example workbook, the workbook and golden file are kept in
+# separate directories to exercise the relative paths
+#---------------------------------------------------------------
+@pytest.fixture
+def golden_file(tmp_path):
+    os.mkdir(str(tmp_path / 'wb'))
+    os.mkdir(str(tmp_path / 'g'))
+    workbook = str(tmp_path / 'wb' / 'build.xlsx')
+    shutil.copy(BUILD_WORKBOOK, workbook)
+    golden = str(tmp_path / 'g' / 'golden.json')
+    assert ccg_regression.record(golden, [workbook], 2, True) == 0
+    return golden
+
+
+def read_golden(golden):
+    with open(golden) as f:
+        return json.load(f)
+
+
+def write_golden(golden, data):
+    with open(golden, 'w') as f:
+        json.dump(data, f)
+
+
+def test_device_sections_follow_config_order():
+    read_data.initalise_data(BUILD_WORKBOOK)
+    for device in read_data.d.devices:
+        sections = ccg.get_device_sections(device)
+        assert [section for section, text in sections] == [section for section, function, args in ccg.CONFIG_SECTIONS]
+        output = io.StringIO()
+        with redirect_stdout(output):
+            ccg.show_device_config(device)
+        assert ''.join(text for section, text in sections) == output.getvalue()
+
+
+def test_device_slices_cover_every_device_once():
+    devices = ['sw{}'.format(number) for number in range(50)]
+    slices = [ccg_regression.slice_devices(devices, index, 3) for index in range(3)]
+    assert sorted(sum(slices, [])) == sorted(devices)
+
+
+def test_unchanged_output_passes(golden_file, capsys):
+    assert ccg_regression.check(golden_file, 2) == 0
+    assert '0 mismatched' in capsys.readouterr().out
+
+
+def test_changed_section_reports_diff(golden_file, capsys):
+    data = read_golden(golden_file)
+    vlans = data['workbooks']['../wb/build.xlsx']['coreswitch']['vlans']
+    vlans['text'] = vlans['text'].replace('CORE-VLAN', 'OLD-VLAN')
+    vlans['hash'] = ccg_regression.hash_text(vlans['text'])
+    write_golden(golden_file, data)
+    capsys.readouterr()
+
+    assert ccg_regression.check(golden_file, 2) == 1
+    output = capsys.readouterr().out
+    assert '../wb/build.xlsx: coreswitch' in output
+    assert 'vlans' in output and '[changed]' in output
+    assert '- name OLD-VLAN' in output
+    assert '+ name CORE-VLAN' in output
+    assert 'accessswitch-1' not in output
+    assert '1 mismatched' in output
+
+
+def test_added_and_removed_devices_are_reported(golden_file, capsys):
+    data = read_golden(golden_file)
+    devices = data['workbooks']['../wb/build.xlsx']
+    devices['oldswitch'] = devices.pop('accessswitch-1')
+    write_golden(golden_file, data)
+    capsys.readouterr()
+
+    assert ccg_regression.check(golden_file, 2) == 1
+    output = capsys.readouterr().out.splitlines()
+    assert output[output.index('../wb/build.xlsx: accessswitch-1') + 1].split() == ['--', 'device', '[added]']
+    assert output[output.index('../wb/build.xlsx: oldswitch') + 1].split() == ['--', 'device', '[removed]']
+    assert '2 mismatched' in output[-1]
+
+
+def test_wrong_golden_version_exits_2(golden_file, capsys):
+    data = read_golden(golden_file)
+    data['version'] = 0.5
+    write_golden(golden_file, data)
+    with pytest.raises(SystemExit) as e:
+        ccg_regression.check(golden_file, 1)
+    assert e.value.code == 2
+    assert 'version 0.5 is not supported' in capsys.readouterr().out
+
+
+def test_check_from_another_directory(golden_file, tmp_path, monkeypatch):
+    assert list(read_golden(golden_file)['workbooks']) == ['../wb/build.xlsx']
+    os.mkdir(str(tmp_path / 'other'))
+    monkeypatch.chdir(str(tmp_path / 'other'))
+    assert ccg_regression.workbook_path(golden_file, '../wb/build.xlsx') == str(tmp_path / 'wb' / 'build.xlsx')
+    assert ccg_regression.check(golden_file, 2) == 0
+
+
+def test_record_to_missing_directory_exits_2(tmp_path, capsys):
+    with pytest.raises(SystemExit) as e:
+        ccg_regression.record(str(tmp_path / 'missing' / 'golden.json'), [BUILD_WORKBOOK], 1, False)
+    assert e.value.code == 2
+    assert 'Cannot write golden file' in capsys.readouterr().out
+
+
+def test_unreadable_workbook_exits_2(tmp_path, capsys):
+    workbook = str(tmp_path / 'bad.xlsx')
+    with open(workbook, 'w') as f:
+        f.write('junk')
+    assert ccg_regression.record(str(tmp_path / 'golden.json'), [workbook], 2, False) == 2
+    assert 'Cannot render: \'bad.xlsx\'' in capsys.readouterr().out
+    assert not os.path.exists(str(tmp_path / 'golden.json'))